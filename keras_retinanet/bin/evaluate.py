@@ -18,6 +18,12 @@ import argparse
 import os
 import sys
 
+# silence TensorFlow's info logging (warnings are still shown) unless asked for otherwise, this has to be set before tensorflow is imported
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '1')
+
+import numpy as np
+import tensorflow as tf
+
 # Allow relative imports when being executed as script.
 if __name__ == "__main__" and __package__ is None:
     sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
@@ -96,7 +102,19 @@ def parse_args(args):
     csv_parser.add_argument('annotations', help='Path to CSV file containing annotations for evaluation.')
     csv_parser.add_argument('classes', help='Path to a CSV file containing class label mapping.')
 
-    parser.add_argument('model',              help='Path to RetinaNet model.')
+    # the Keras model is not loaded when evaluating a TensorRT engine, so it is only required without --engine
+    # (nargs='?' can not be used unconditionally, the dataset subparser would consume the model path)
+    engine_parser = argparse.ArgumentParser(add_help=False)
+    engine_parser.add_argument('--engine')
+    uses_engine = engine_parser.parse_known_args(args)[0].engine is not None
+
+    parser.add_argument('model',              help='Path to RetinaNet model (omitted when using --engine).', nargs='?' if uses_engine else None)
+    parser.add_argument('--engine',           help='Path to a serialized TensorRT engine of the inference model, used instead of the Keras model. '
+                                                   'Build it with --onnx, or with trtexec using --minShapes, --optShapes and --maxShapes up to 1xMAXxMAXx3 (MAX is --image-max-side), '
+                                                   'otherwise the dynamic image size is fixed to 1x1.')
+    parser.add_argument('--onnx',             help='Path to an ONNX export of the inference model, used to (re)build the engine given by --engine.')
+    parser.add_argument('--precision',        help='Precision of the TensorRT engine built from --onnx.', default='fp16', choices=['fp32', 'fp16', 'int8'])
+    parser.add_argument('--calibration-size', help='Number of images used to calibrate an INT8 engine (defaults to 500).', default=500, type=int)
     parser.add_argument('--convert-model',    help='Convert the model to an inference model (ie. the input is a training model).', action='store_true')
     parser.add_argument('--backbone',         help='The backbone of the model.', default='resnet50')
     parser.add_argument('--gpu',              help='Id of the GPU to use (as reported by nvidia-smi).')
@@ -108,9 +126,31 @@ def parse_args(args):
     parser.add_argument('--image-max-side',   help='Rescale the image if the largest side is larger than max_side.', type=int, default=1333)
     parser.add_argument('--no-resize',        help='Don''t rescale the image.', action='store_true')
     parser.add_argument('--config',           help='Path to a configuration parameters .ini file (only used with --convert-model).')
+    parser.add_argument('--verbose',          help='Print the model summary before evaluating.', action='store_true')
+    parser.add_argument('--xla',              help='Enable XLA JIT compilation of the model graph.', action='store_true')
     parser.add_argument('--group-method',     help='Determines how images are grouped together', type=str, default='ratio', choices=['none', 'random', 'ratio'])
 
-    return parser.parse_args(args)
+    parsed_args = parser.parse_args(args)
+
+    # the TensorRT options only apply when evaluating with an engine
+    if parsed_args.onnx and not parsed_args.engine:
+        parser.error('--onnx requires --engine, the path to write the built TensorRT engine to.')
+    if not parsed_args.onnx and (parsed_args.precision != parser.get_default('precision') or parsed_args.calibration_size != parser.get_default('calibration_size')):
+        parser.error('--precision and --calibration-size only apply when building an engine with --onnx.')
+
+    # the Keras model options don't apply to a TensorRT engine
+    if parsed_args.engine and (parsed_args.convert_model or parsed_args.config):
+        parser.error('--convert-model and --config can not be used with --engine, convert the model before exporting it instead.')
+
+    # TensorRT runs on exactly one GPU
+    if parsed_args.engine and parsed_args.gpu and not parsed_args.gpu.isdigit():
+        parser.error('--gpu has to be a single GPU id when used with --engine.')
+
+    # TensorRT engines only support images up to --image-max-side
+    if parsed_args.engine and parsed_args.no_resize:
+        parser.error('--no-resize can not be used with --engine, the engine only supports images up to --image-max-side.')
+
+    return parsed_args
 
 
 def main(args=None):
@@ -123,9 +163,16 @@ def main(args=None):
     check_tf_version()
 
     # optionally choose specific GPU
-    if args.gpu:
+    if args.engine:
+        # the engine runs on its own CUDA context, TensorFlow is only used for the input pipeline and stays on the CPU
+        tf.config.set_visible_devices([], 'GPU')
+    elif args.gpu:
         setup_gpu(args.gpu)
 
+    # optionally enable XLA
+    if args.xla:
+        tf.config.optimizer.set_jit(True)
+
     # make save path if it doesn't exist
     if args.save_path is not None and not os.path.exists(args.save_path):
         os.makedirs(args.save_path)
@@ -148,15 +195,48 @@ def main(args=None):
 
     # load the model
     print('Loading model, this may take a second...')
-    model = models.load_model(args.model, backbone_name=args.backbone)
-    generator.compute_shapes = make_shapes_callback(model)
+    if args.engine:
+        from ..utils.trt import build_trt_engine, load_trt_engine
+
+        gpu_id = int(args.gpu) if args.gpu else 0
+
+        if args.onnx:
+            print('Building TensorRT engine, this may take a while...')
+            calibration_images = None
+            if args.precision == 'int8':
+                calibration_images = (
+                    generator.preprocess_image(generator.resize_image(generator.load_image(i))[0])
+                    for i in range(min(args.calibration_size, generator.size()))
+                )
+            build_trt_engine(
+                args.onnx,
+                args.engine,
+                precision=args.precision,
+                min_side=args.image_min_side,
+                max_side=args.image_max_side,
+                calibration_images=calibration_images,
+                gpu_id=gpu_id
+            )
+
+        model = load_trt_engine(args.engine, gpu_id=gpu_id)
+    else:
+        model = models.load_model(args.model, backbone_name=args.backbone)
+        generator.compute_shapes = make_shapes_callback(model)
+
+        # optionally convert the model
+        if args.convert_model:
+            model = models.convert_model(model, anchor_params=anchor_params, pyramid_levels=pyramid_levels)
 
-    # optionally convert the model
-    if args.convert_model:
-        model = models.convert_model(model, anchor_params=anchor_params, pyramid_levels=pyramid_levels)
+        # run the model once, so tracing the prediction function is not counted as inference time
+        # the dynamic image dimensions (height, then width) get the shape of a resized landscape image,
+        # with --xla other image shapes are still compiled the first time they are seen
+        spatial_sides = iter([args.image_min_side, args.image_max_side])
+        warmup_shape  = [1] + [dim if dim is not None else next(spatial_sides) for dim in model.input_shape[1:]]
+        model.predict_on_batch(np.zeros(warmup_shape, dtype=np.float32))
 
     # print model summary
-    # print(model.summary())
+    if args.verbose and not args.engine:
+        model.summary()
 
     # start evaluation
     if args.dataset_type == 'coco':
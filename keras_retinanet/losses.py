@@ -41,26 +41,26 @@ def focal(alpha=0.25, gamma=2.0, cutoff=0.5):
         Returns
             The focal loss of y_pred w.r.t. y_true.
         """
-        labels         = y_true[:, :, :-1]
         anchor_state   = y_true[:, :, -1]  # -1 for ignore, 0 for background, 1 for object
-        classification = y_pred
 
-        # filter out "ignore" anchors
-        indices        = tensorflow.where(keras.backend.not_equal(anchor_state, -1))
-        labels         = tensorflow.gather_nd(labels, indices)
-        classification = tensorflow.gather_nd(classification, indices)
+        # the log in the cross entropy is unstable in half precision, so always compute in floatx
+        labels         = keras.backend.cast(y_true[:, :, :-1], keras.backend.floatx())
+        classification = keras.backend.cast(y_pred, keras.backend.floatx())
+
+        # mask out "ignore" anchors, this keeps the shapes static so the computation below can be fused
+        mask = keras.backend.cast(keras.backend.not_equal(anchor_state, -1), keras.backend.floatx())
+        mask = keras.backend.expand_dims(mask, axis=-1)
 
         # compute the focal loss
-        alpha_factor = keras.backend.ones_like(labels) * alpha
-        alpha_factor = tensorflow.where(keras.backend.greater(labels, cutoff), alpha_factor, 1 - alpha_factor)
-        focal_weight = tensorflow.where(keras.backend.greater(labels, cutoff), 1 - classification, classification)
+        positive     = keras.backend.cast(keras.backend.greater(labels, cutoff), keras.backend.floatx())
+        alpha_factor = positive * alpha + (1 - positive) * (1 - alpha)
+        focal_weight = positive * (1 - classification) + (1 - positive) * classification
         focal_weight = alpha_factor * focal_weight ** gamma
 
-        cls_loss = focal_weight * keras.backend.binary_crossentropy(labels, classification)
+        cls_loss = mask * focal_weight * keras.backend.binary_crossentropy(labels, classification)
 
         # compute the normalizer: the number of positive anchors
-        normalizer = tensorflow.where(keras.backend.equal(anchor_state, 1))
-        normalizer = keras.backend.cast(keras.backend.shape(normalizer)[0], keras.backend.floatx())
+        normalizer = keras.backend.sum(keras.backend.cast(keras.backend.equal(anchor_state, 1), keras.backend.floatx()))
         normalizer = keras.backend.maximum(keras.backend.cast_to_floatx(1.0), normalizer)
 
         return keras.backend.sum(cls_loss) / normalizer
@@ -77,7 +77,10 @@ def smooth_l1(sigma=3.0):
     Returns
         A functor for computing the smooth L1 loss given target data and predicted data.
     """
-    sigma_squared = sigma ** 2
+    sigma_squared          = sigma ** 2
+    inv_sigma_squared      = 1.0 / sigma_squared
+    half_sigma_squared     = 0.5 * sigma_squared
+    half_inv_sigma_squared = 0.5 * inv_sigma_squared
 
     def _smooth_l1(y_true, y_pred):
         """ Compute the smooth L1 loss of y_pred w.r.t. y_true.
@@ -89,15 +92,13 @@ def smooth_l1(sigma=3.0):
         Returns
             The smooth L1 loss of y_pred w.r.t. y_true.
         """
-        # separate target and state
+        # separate target and state, the elementwise loss is computed in the dtype of the network output
         regression        = y_pred
-        regression_target = y_true[:, :, :-1]
+        regression_target = keras.backend.cast(y_true[:, :, :-1], regression.dtype)
         anchor_state      = y_true[:, :, -1]
 
-        # filter out "ignore" anchors
-        indices           = tensorflow.where(keras.backend.equal(anchor_state, 1))
-        regression        = tensorflow.gather_nd(regression, indices)
-        regression_target = tensorflow.gather_nd(regression_target, indices)
+        # only positive anchors contribute to the loss
+        positive_mask = keras.backend.cast(keras.backend.equal(anchor_state, 1), keras.backend.floatx())
 
         # compute smooth L1 loss
         # f(x) = 0.5 * (sigma * x)^2          if |x| < 1 / sigma / sigma
@@ -105,14 +106,18 @@ def smooth_l1(sigma=3.0):
         regression_diff = regression - regression_target
         regression_diff = keras.backend.abs(regression_diff)
         regression_loss = tensorflow.where(
-            keras.backend.less(regression_diff, 1.0 / sigma_squared),
-            0.5 * sigma_squared * keras.backend.pow(regression_diff, 2),
-            regression_diff - 0.5 / sigma_squared
+            keras.backend.less(regression_diff, inv_sigma_squared),
+            half_sigma_squared * regression_diff * regression_diff,
+            regression_diff - half_inv_sigma_squared
         )
+        regression_loss = regression_loss * keras.backend.cast(keras.backend.expand_dims(positive_mask, axis=-1), regression.dtype)
+
+        # reduce in floatx to avoid overflowing half precision when summing over all anchors
+        regression_loss = keras.backend.cast(regression_loss, keras.backend.floatx())
 
         # compute the normalizer: the number of positive anchors
-        normalizer = keras.backend.maximum(1, keras.backend.shape(indices)[0])
-        normalizer = keras.backend.cast(normalizer, dtype=keras.backend.floatx())
-        return keras.backend.sum(regression_loss) / normalizer
+        # without positive anchors the summed loss is zero as well, so 0 / 0 is defined as 0
+        normalizer = keras.backend.sum(positive_mask)
+        return tensorflow.math.divide_no_nan(keras.backend.sum(regression_loss), normalizer)
 
     return _smooth_l1
@@ -62,7 +62,7 @@ def backbone(backbone_name):
     elif 'EfficientNet' in backbone_name:
         from .effnet import EfficientNetBackbone as b
     else:
-        raise NotImplementedError('Backbone class for  \'{}\' not implemented.'.format(backbone))
+        raise NotImplementedError('Backbone class for  \'{}\' not implemented.'.format(backbone_name))
 
     return b(backbone_name)
 
@@ -16,7 +16,8 @@ limitations under the License.
 
 from pycocotools.cocoeval import COCOeval
 
-from tensorflow import keras
+from .eval import load_images
+
 import numpy as np
 import json
 
@@ -35,14 +36,8 @@ def evaluate_coco(generator, model, threshold=0.05):
     # start collecting results
     results = []
     image_ids = []
-    for index in progressbar.progressbar(range(generator.size()), prefix='COCO evaluation: '):
-        image = generator.load_image(index)
-        image = generator.preprocess_image(image)
-        image, scale = generator.resize_image(image)
-
-        if keras.backend.image_data_format() == 'channels_first':
-            image = image.transpose((2, 0, 1))
-
+    images = load_images(generator)
+    for index, (image, scale) in enumerate(progressbar.progressbar(images, max_value=generator.size(), prefix='COCO evaluation: ')):
         # run network
         boxes, scores, labels = model.predict_on_batch(np.expand_dims(image, axis=0))
 
@@ -17,6 +17,7 @@ limitations under the License.
 from .anchors import compute_overlap
 from .visualization import draw_detections, draw_annotations
 
+import tensorflow
 from tensorflow import keras
 import numpy as np
 import os
@@ -44,8 +45,7 @@ def _compute_ap(recall, precision):
     mpre = np.concatenate(([0.], precision, [0.]))
 
     # compute the precision envelope
-    for i in range(mpre.size - 1, 0, -1):
-        mpre[i - 1] = np.maximum(mpre[i - 1], mpre[i])
+    mpre = np.maximum.accumulate(mpre[::-1])[::-1]
 
     # to calculate area under PR curve, look for points
     # where X axis (recall) changes value
@@ -56,6 +56,36 @@ def _compute_ap(recall, precision):
     return ap
 
 
+def load_images(generator):
+    """ Load, resize and preprocess the images of the generator in the background.
+
+    Images are returned in order, but the next images are already prepared while the network runs on the current one.
+
+    # Arguments
+        generator : The generator to load the images from.
+    # Returns
+        An iterator over (image, scale) tuples for each image in the generator, where image is the float32 network input.
+    """
+    def _load(image_index):
+        image        = generator.load_image(image_index)
+        image, scale = generator.resize_image(image)
+        image        = generator.preprocess_image(image)
+
+        if keras.backend.image_data_format() == 'channels_first':
+            image = image.transpose((2, 0, 1))
+
+        return image.astype(np.float32, copy=False), np.float64(scale)
+
+    dataset = tensorflow.data.Dataset.range(generator.size())
+    dataset = dataset.map(
+        lambda image_index: tensorflow.numpy_function(_load, [image_index], [tensorflow.float32, tensorflow.float64]),
+        num_parallel_calls=tensorflow.data.experimental.AUTOTUNE
+    )
+    dataset = dataset.prefetch(tensorflow.data.experimental.AUTOTUNE)
+
+    return dataset.as_numpy_iterator()
+
+
 def _get_detections(generator, model, score_threshold=0.05, max_detections=100, save_path=None):
     """ Get the detections from the model using the generator.
 
@@ -74,14 +104,8 @@ def _get_detections(generator, model, score_threshold=0.05, max_detections=100,
     all_detections = [[None for i in range(generator.num_classes()) if generator.has_label(i)] for j in range(generator.size())]
     all_inferences = [None for i in range(generator.size())]
 
-    for i in progressbar.progressbar(range(generator.size()), prefix='Running network: '):
-        raw_image    = generator.load_image(i)
-        image, scale = generator.resize_image(raw_image.copy())
-        image = generator.preprocess_image(image)
-
-        if keras.backend.image_data_format() == 'channels_first':
-            image = image.transpose((2, 0, 1))
-
+    images = load_images(generator)
+    for i, (image, scale) in enumerate(progressbar.progressbar(images, max_value=generator.size(), prefix='Running network: ')):
         # run network
         start = time.time()
         boxes, scores, labels = model.predict_on_batch(np.expand_dims(image, axis=0))[:3]
@@ -106,6 +130,7 @@ def _get_detections(generator, model, score_threshold=0.05, max_detections=100,
         image_detections = np.concatenate([image_boxes, np.expand_dims(image_scores, axis=1), np.expand_dims(image_labels, axis=1)], axis=1)
 
         if save_path is not None:
+            raw_image = generator.load_image(i)
             draw_annotations(raw_image, generator.load_annotations(i), label_to_name=generator.label_to_name)
             draw_detections(raw_image, image_boxes, image_scores, image_labels, label_to_name=generator.label_to_name, score_threshold=score_threshold)
 
@@ -185,36 +210,37 @@ def evaluate(
         if not generator.has_label(label):
             continue
 
-        false_positives = np.zeros((0,))
-        true_positives  = np.zeros((0,))
-        scores          = np.zeros((0,))
+        true_positives  = []
+        scores          = []
         num_annotations = 0.0
 
         for i in range(generator.size()):
             detections           = all_detections[i][label]
             annotations          = all_annotations[i][label]
             num_annotations     += annotations.shape[0]
-            detected_annotations = []
+            detected_annotations = set()
 
-            for d in detections:
-                scores = np.append(scores, d[4])
+            scores.extend(detections[:, 4])
 
-                if annotations.shape[0] == 0:
-                    false_positives = np.append(false_positives, 1)
-                    true_positives  = np.append(true_positives, 0)
-                    continue
+            if annotations.shape[0] == 0:
+                true_positives.extend([0] * detections.shape[0])
+                continue
 
-                overlaps            = compute_overlap(np.expand_dims(d, axis=0), annotations)
-                assigned_annotation = np.argmax(overlaps, axis=1)
-                max_overlap         = overlaps[0, assigned_annotation]
+            # compute the overlaps of all detections in this image at once
+            overlaps             = compute_overlap(detections.astype(np.float64, copy=False), annotations)
+            assigned_annotations = np.argmax(overlaps, axis=1)
+            max_overlaps         = overlaps[np.arange(detections.shape[0]), assigned_annotations]
 
+            for assigned_annotation, max_overlap in zip(assigned_annotations, max_overlaps):
                 if max_overlap >= iou_threshold and assigned_annotation not in detected_annotations:
-                    false_positives = np.append(false_positives, 0)
-                    true_positives  = np.append(true_positives, 1)
-                    detected_annotations.append(assigned_annotation)
+                    true_positives.append(1)
+                    detected_annotations.add(assigned_annotation)
                 else:
-                    false_positives = np.append(false_positives, 1)
-                    true_positives  = np.append(true_positives, 0)
+                    true_positives.append(0)
+
+        true_positives  = np.array(true_positives, dtype=np.float64)
+        false_positives = 1 - true_positives
+        scores          = np.array(scores, dtype=np.float64)
 
         # no annotations -> AP for this class is 0 (is this correct?)
         if num_annotations == 0:
@@ -0,0 +1,315 @@
+"""
+Copyright 2017-2018 Fizyr (https://fizyr.com)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import atexit
+import numpy as np
+
+# the CUDA context used for all TensorRT work in this process, see setup_cuda_device
+_cuda_context = None
+_cuda_device  = None
+
+
+def setup_cuda_device(gpu_id=None):
+    """ Create the CUDA context used by TensorRT and make it current.
+
+    This replaces pycuda.autoinit, which always uses device 0 (or CUDA_DEVICE) and ignores the requested GPU.
+    The context is created once per process and released at exit.
+
+    Args
+        gpu_id: Id of the GPU to use. If None, the existing context is used or one is created on device 0.
+
+    Returns
+        The pycuda context.
+    """
+    global _cuda_context, _cuda_device
+
+    import pycuda.driver as cuda
+
+    if _cuda_context is not None:
+        if gpu_id is not None and gpu_id != _cuda_device:
+            raise ValueError('CUDA context already created on GPU {}, can not switch to GPU {}.'.format(_cuda_device, gpu_id))
+        return _cuda_context
+
+    if gpu_id is None:
+        gpu_id = 0
+
+    cuda.init()
+    _cuda_context = cuda.Device(gpu_id).make_context()
+    _cuda_device  = gpu_id
+    atexit.register(_cuda_context.pop)
+
+    return _cuda_context
+
+
+class TensorRTModel(object):
+    """ Wraps a serialized TensorRT engine so it can be used in place of a Keras inference model.
+
+    Only predict_on_batch is implemented, which is all that is needed by the evaluation utilities.
+    The engine is expected to have a single input (the preprocessed image batch) and to produce
+    the same outputs, in the same order, as the converted inference model (boxes, scores, labels).
+    The shapes of these outputs have to be determined by the input shape alone.
+
+    This uses the tensor name based API of TensorRT, which requires TensorRT 8.5 or later.
+    """
+
+    def __init__(self, engine_path, gpu_id=None):
+        """ Deserialize the engine, create an execution context and allocate the buffers.
+
+        Args
+            engine_path: Path to a serialized TensorRT engine (ie. created with build_trt_engine, or trtexec --saveEngine with --minShapes, --optShapes and --maxShapes).
+            gpu_id     : Id of the GPU to run the engine on (see setup_cuda_device).
+        """
+        # import here to prevent unnecessary dependency on TensorRT and pycuda
+        import tensorrt as trt
+        import pycuda.driver as cuda
+
+        setup_cuda_device(gpu_id)
+        self.cuda = cuda
+
+        logger = trt.Logger(trt.Logger.WARNING)
+        with open(engine_path, 'rb') as f, trt.Runtime(logger) as runtime:
+            self.engine = runtime.deserialize_cuda_engine(f.read())
+
+        if self.engine is None:
+            raise ValueError('Failed to deserialize TensorRT engine from {}.'.format(engine_path))
+
+        self.context = self.engine.create_execution_context()
+        self.stream  = cuda.Stream()
+
+        names             = [self.engine.get_tensor_name(i) for i in range(self.engine.num_io_tensors)]
+        self.input_name   = [name for name in names if self.engine.get_tensor_mode(name) == trt.TensorIOMode.INPUT][0]
+        self.output_names = [name for name in names if self.engine.get_tensor_mode(name) == trt.TensorIOMode.OUTPUT]
+
+        # engines with a dynamic input shape get their buffers sized for the largest shape of their optimization profile
+        self.max_input_shape = tuple(self.engine.get_tensor_shape(self.input_name))
+        self.dynamic_input   = -1 in self.max_input_shape
+        if self.dynamic_input:
+            self.max_input_shape = tuple(self.engine.get_tensor_profile_shape(self.input_name, 0)[2])
+            self.context.set_input_shape(self.input_name, self.max_input_shape)
+
+        # allocate pinned host buffers and device buffers once, images only use a view on them
+        self.host_buffers   = {}
+        self.device_buffers = {}
+        for name in names:
+            shape = tuple(self.context.get_tensor_shape(name))
+            if -1 in shape:
+                raise ValueError('Shape {} of engine tensor \'{}\' is data dependent, only outputs with shapes determined by the input shape are supported.'.format(shape, name))
+
+            size  = int(np.prod(shape))
+            dtype = trt.nptype(self.engine.get_tensor_dtype(name))
+
+            self.host_buffers[name]   = cuda.pagelocked_empty(size, dtype)
+            self.device_buffers[name] = cuda.mem_alloc(self.host_buffers[name].nbytes)
+            self.context.set_tensor_address(name, int(self.device_buffers[name]))
+
+    def predict_on_batch(self, inputs):
+        """ Run the engine on a batch of images.
+
+        Args
+            inputs: np.array of shape (B, H, W, C) containing the preprocessed images.
+
+        Returns
+            A list of np.array, one for each output of the engine.
+        """
+        if self.dynamic_input:
+            if not self.context.set_input_shape(self.input_name, inputs.shape):
+                raise ValueError('Input shape {} is outside the optimization profile of the engine (max: {}).'.format(inputs.shape, self.max_input_shape))
+        elif inputs.shape != self.max_input_shape:
+            raise ValueError('Input shape {} does not match the input shape of the engine ({}).'.format(inputs.shape, self.max_input_shape))
+
+        host_input = self.host_buffers[self.input_name][:inputs.size].reshape(inputs.shape)
+        np.copyto(host_input, inputs)
+        self.cuda.memcpy_htod_async(self.device_buffers[self.input_name], host_input, self.stream)
+
+        self.context.execute_async_v3(stream_handle=self.stream.handle)
+
+        outputs = []
+        for name in self.output_names:
+            shape       = tuple(self.context.get_tensor_shape(name))
+            host_output = self.host_buffers[name][:int(np.prod(shape))].reshape(shape)
+            self.cuda.memcpy_dtoh_async(host_output, self.device_buffers[name], self.stream)
+            outputs.append(host_output)
+        self.stream.synchronize()
+
+        return [output.copy() for output in outputs]
+
+
+def load_trt_engine(engine_path, gpu_id=None):
+    """ Load a serialized TensorRT engine as a model supporting predict_on_batch.
+
+    Args
+        engine_path: Path to a serialized TensorRT engine.
+        gpu_id     : Id of the GPU to run the engine on (see setup_cuda_device).
+
+    Returns
+        A TensorRTModel wrapping the engine.
+    """
+    return TensorRTModel(engine_path, gpu_id=gpu_id)
+
+
+class CalibrationBatches(object):
+    """ The TensorRT independent part of the INT8 calibrator: batching the calibration images and writing the cache.
+
+    The calibration cache is written for reference (ie. to reuse it with trtexec --calib), but it is never read.
+    Engines are only built from --onnx to (re)build them, so a cache left by a previous build would belong to
+    a different model or calibration set and would make TensorRT silently skip calibration.
+    """
+
+    def __init__(self, images, input_shape, cache_path=None):
+        """ Initialize the calibration batches.
+
+        Args
+            images     : Iterable of preprocessed images of shape (H, W, C).
+            input_shape: Shape (1, H, W, C) of the calibration batches, images are cropped or zero padded to this shape.
+            cache_path : Optional path to write the calibration cache to, an existing file is overwritten.
+        """
+        self.images      = iter(images)
+        self.input_shape = input_shape
+        self.cache_path  = cache_path
+        self.batch       = np.zeros(input_shape, dtype=np.float32)
+
+    def get_batch_size(self):
+        return self.input_shape[0]
+
+    def next_batch(self):
+        """ Fill the batch with the next calibration image.
+
+        Returns
+            The batch as np.array of shape input_shape, or None when all images have been used.
+        """
+        image = next(self.images, None)
+        if image is None:
+            return None
+
+        # images in the other orientation don't fit the calibration shape, crop those instead of rejecting them
+        height = min(image.shape[0], self.input_shape[1])
+        width  = min(image.shape[1], self.input_shape[2])
+
+        self.batch[...] = 0
+        self.batch[0, :height, :width, :] = image[:height, :width, :]
+        return self.batch
+
+    def read_calibration_cache(self):
+        # always calibrate, see the class docstring
+        return None
+
+    def write_calibration_cache(self, cache):
+        if self.cache_path is not None:
+            with open(self.cache_path, 'wb') as f:
+                f.write(cache)
+
+
+def _int8_calibrator(images, input_shape, cache_path=None):
+    """ Create an INT8 entropy calibrator that feeds the given images to TensorRT.
+
+    Args
+        images     : Iterable of preprocessed images of shape (H, W, C).
+        input_shape: Shape (1, H, W, C) of the calibration batches, images are cropped or zero padded to this shape.
+        cache_path : Optional path to write the calibration cache to (see CalibrationBatches).
+
+    Returns
+        A tensorrt.IInt8EntropyCalibrator2 instance.
+    """
+    import tensorrt as trt
+    import pycuda.driver as cuda
+
+    setup_cuda_device()
+
+    class Int8Calibrator(CalibrationBatches, trt.IInt8EntropyCalibrator2):
+        def __init__(self):
+            trt.IInt8EntropyCalibrator2.__init__(self)
+            CalibrationBatches.__init__(self, images, input_shape, cache_path=cache_path)
+            self.device_input = cuda.mem_alloc(self.batch.nbytes)
+
+        def get_batch(self, names):
+            batch = self.next_batch()
+            if batch is None:
+                return None
+
+            cuda.memcpy_htod(self.device_input, batch)
+            return [int(self.device_input)]
+
+    return Int8Calibrator()
+
+
+def build_trt_engine(onnx_path, engine_path, precision='fp16', min_side=800, max_side=1333, calibration_images=None, gpu_id=None):
+    """ Build a serialized TensorRT engine from an ONNX export of an inference model.
+
+    Args
+        onnx_path         : Path to the ONNX model.
+        engine_path       : Path to write the serialized engine to.
+        precision         : One of ('fp32', 'fp16', 'int8').
+        min_side          : Smallest image side the images are resized to, used for the optimal and calibration shapes.
+        max_side          : Largest image side the engine has to support.
+        calibration_images: Iterable of preprocessed images used for INT8 calibration (required for 'int8').
+        gpu_id            : Id of the GPU to build the engine on (see setup_cuda_device).
+    """
+    import tensorrt as trt
+
+    if precision not in ('fp32', 'fp16', 'int8'):
+        raise ValueError('Invalid precision received: {}'.format(precision))
+    if precision == 'int8' and calibration_images is None:
+        raise ValueError('INT8 precision requires calibration images.')
+
+    # engines are optimized for the GPU they are built on
+    setup_cuda_device(gpu_id)
+
+    logger  = trt.Logger(trt.Logger.WARNING)
+    builder = trt.Builder(logger)
+    # explicit batch is required for ONNX models before TensorRT 10, where it became the only mode
+    flags = 0
+    if hasattr(trt.NetworkDefinitionCreationFlag, 'EXPLICIT_BATCH'):
+        flags = 1 << int(trt.NetworkDefinitionCreationFlag.EXPLICIT_BATCH)
+
+    network = builder.create_network(flags)
+    parser  = trt.OnnxParser(network, logger)
+
+    with open(onnx_path, 'rb') as f:
+        if not parser.parse(f.read()):
+            errors = [str(parser.get_error(i)) for i in range(parser.num_errors)]
+            raise ValueError('Failed to parse ONNX model {}:\n{}'.format(onnx_path, '\n'.join(errors)))
+
+    config = builder.create_builder_config()
+
+    # layers without an INT8 implementation fall back to FP16 instead of FP32
+    if precision in ('fp16', 'int8'):
+        config.set_flag(trt.BuilderFlag.FP16)
+
+    # images have different sizes, so the height and width of the input are dynamic
+    # resized images have their smallest side at min_side and both sides at most max_side
+    input_tensor = network.get_input(0)
+    channels     = input_tensor.shape[-1]
+    opt_shape    = (1, min_side, max_side, channels)
+    max_shape    = (1, max_side, max_side, channels)
+    profile      = builder.create_optimization_profile()
+    profile.set_shape(input_tensor.name, (1, 32, 32, channels), opt_shape, max_shape)
+    config.add_optimization_profile(profile)
+
+    if precision == 'int8':
+        # calibrate at a realistic image shape, padding to max_shape would make a large part of every batch zeros
+        calibration_profile = builder.create_optimization_profile()
+        calibration_profile.set_shape(input_tensor.name, opt_shape, opt_shape, opt_shape)
+
+        config.set_flag(trt.BuilderFlag.INT8)
+        config.set_calibration_profile(calibration_profile)
+        config.int8_calibrator = _int8_calibrator(calibration_images, opt_shape, cache_path=engine_path + '.calibration')
+
+    serialized_engine = builder.build_serialized_network(network, config)
+    if serialized_engine is None:
+        raise ValueError('Failed to build TensorRT engine from {}.'.format(onnx_path))
+
+    with open(engine_path, 'wb') as f:
+        f.write(serialized_engine)
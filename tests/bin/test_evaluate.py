@@ -0,0 +1,53 @@
+"""
+Copyright 2017-2018 Fizyr (https://fizyr.com)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import keras_retinanet.bin.evaluate
+
+import pytest
+
+
+DATASET = ['csv', 'annotations.csv', 'classes.csv']
+
+
+def test_keras_model():
+    args = keras_retinanet.bin.evaluate.parse_args(DATASET + ['model.h5'])
+    assert args.model == 'model.h5'
+    assert args.engine is None
+
+
+def test_engine():
+    args = keras_retinanet.bin.evaluate.parse_args(['--engine', 'model.engine', '--onnx', 'model.onnx', '--precision', 'int8', '--calibration-size', '10'] + DATASET)
+    assert args.model is None
+    assert args.engine == 'model.engine'
+    assert args.onnx == 'model.onnx'
+    assert args.precision == 'int8'
+    assert args.calibration_size == 10
+
+
+@pytest.mark.parametrize('args', [
+    DATASET,                                                                   # neither a model nor --engine
+    ['--onnx', 'model.onnx'] + DATASET + ['model.h5'],                         # --onnx without --engine
+    ['--precision', 'int8'] + DATASET + ['model.h5'],                          # --precision without --onnx
+    ['--calibration-size', '10'] + DATASET + ['model.h5'],                     # --calibration-size without --onnx
+    ['--engine', 'model.engine', '--precision', 'int8'] + DATASET,             # --precision without --onnx
+    ['--engine', 'model.engine', '--no-resize'] + DATASET,                     # engines have a maximum image size
+    ['--engine', 'model.engine', '--convert-model'] + DATASET,                 # the Keras model is not loaded
+    ['--engine', 'model.engine', '--config', 'config.ini'] + DATASET,          # the Keras model is not loaded
+    ['--engine', 'model.engine', '--gpu', '0,1'] + DATASET,                    # engines run on a single GPU
+])
+def test_invalid_arguments(args):
+    with pytest.raises(SystemExit):
+        keras_retinanet.bin.evaluate.parse_args(args)
@@ -31,3 +31,110 @@ def test_smooth_l1():
     loss = keras.backend.eval(loss)
 
     assert loss == pytest.approx((((1 - 0.5 / 9) * 2 + (0.5 * 9 * 0.05 ** 2)) / 3))
+
+
+def focal_loss_element(label, prediction, alpha=0.25, gamma=2.0, cutoff=0.5):
+    """ Focal loss of a single class prediction, as computed by the original gather based implementation.
+    """
+    positive     = label > cutoff
+    alpha_factor = alpha if positive else 1 - alpha
+    focal_weight = 1 - prediction if positive else prediction
+    bce          = -(label * np.log(prediction) + (1 - label) * np.log(1 - prediction))
+    return alpha_factor * focal_weight ** gamma * bce
+
+
+def test_focal():
+    classification = np.array([
+        [
+            [0.8, 0.1],
+            [0.3, 0.2],
+            [0.9, 0.9],
+            [0.7, 0.6],
+        ]
+    ], dtype=keras.backend.floatx())
+    classification = keras.backend.variable(classification)
+
+    labels = np.array([
+        [
+            [1,   0,   1],   # positive
+            [0,   0,   0],   # background
+            [1,   0,  -1],   # ignored
+            [0.6, 0.4, 1],   # soft labels around the cutoff
+        ]
+    ], dtype=keras.backend.floatx())
+    labels = keras.backend.variable(labels)
+
+    loss = keras_retinanet.losses.focal()(labels, classification)
+    loss = keras.backend.eval(loss)
+
+    expected = sum([
+        focal_loss_element(1, 0.8), focal_loss_element(0, 0.1),
+        focal_loss_element(0, 0.3), focal_loss_element(0, 0.2),
+        focal_loss_element(0.6, 0.7), focal_loss_element(0.4, 0.6),
+    ]) / 2  # two positive anchors
+
+    assert loss == pytest.approx(expected, rel=1e-5)
+
+
+def test_focal_no_positives():
+    classification = np.array([
+        [
+            [0.3, 0.2],
+            [0.9, 0.9],
+        ]
+    ], dtype=keras.backend.floatx())
+    classification = keras.backend.variable(classification)
+
+    labels = np.array([
+        [
+            [0, 0,  0],   # background
+            [1, 0, -1],   # ignored
+        ]
+    ], dtype=keras.backend.floatx())
+    labels = keras.backend.variable(labels)
+
+    loss = keras_retinanet.losses.focal()(labels, classification)
+    loss = keras.backend.eval(loss)
+
+    # without positive anchors the normalizer is clamped to one, background anchors still contribute
+    expected = focal_loss_element(0, 0.3) + focal_loss_element(0, 0.2)
+
+    assert loss == pytest.approx(expected, rel=1e-5)
+
+
+def test_losses_float16_predictions():
+    # under a mixed precision policy the network outputs are float16, while the targets remain floatx
+    regression_target = np.array([
+        [
+            [0, 0, 0,    1, 1],
+            [0, 0, 1,    0, 1],
+            [0, 0, 0.05, 0, 1],
+            [0, 0, 1,    0, 0],
+        ]
+    ], dtype=keras.backend.floatx())
+    regression = np.zeros((1, 4, 4), dtype=np.float16)
+
+    loss = keras_retinanet.losses.smooth_l1()(keras.backend.constant(regression_target), keras.backend.constant(regression, dtype='float16'))
+    assert loss.dtype == keras.backend.floatx()
+    assert keras.backend.eval(loss) == pytest.approx((((1 - 0.5 / 9) * 2 + (0.5 * 9 * 0.05 ** 2)) / 3), rel=1e-3)
+
+    labels = np.array([
+        [
+            [1, 0,  1],
+            [0, 0,  0],
+            [1, 0, -1],
+        ]
+    ], dtype=keras.backend.floatx())
+    classification = np.array([
+        [
+            [0.8, 0.1],
+            [0.3, 0.2],
+            [0.9, 0.9],
+        ]
+    ], dtype=np.float16)
+
+    loss = keras_retinanet.losses.focal()(keras.backend.constant(labels), keras.backend.constant(classification, dtype='float16'))
+    assert loss.dtype == keras.backend.floatx()
+
+    expected = keras_retinanet.losses.focal()(keras.backend.constant(labels), keras.backend.constant(classification.astype(keras.backend.floatx())))
+    assert keras.backend.eval(loss) == pytest.approx(keras.backend.eval(expected), rel=1e-6)
@@ -0,0 +1,153 @@
+"""
+Copyright 2017-2018 Fizyr (https://fizyr.com)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from keras_retinanet.preprocessing.generator import Generator
+from keras_retinanet.utils.eval import _compute_ap, evaluate, load_images
+from keras_retinanet.utils.image import compute_resize_scale
+
+import numpy as np
+import pytest
+
+
+class SimpleGenerator(Generator):
+    def __init__(self, images, bboxes, labels, num_classes=1):
+        assert(len(images) == len(bboxes) == len(labels))
+        self.images       = images
+        self.bboxes       = bboxes
+        self.labels       = labels
+        self.num_classes_ = num_classes
+        super(SimpleGenerator, self).__init__(
+            group_method='none',
+            shuffle_groups=False,
+            image_min_side=16,
+            image_max_side=32,
+            preprocess_image=lambda image: image.astype(np.float64)
+        )
+
+    def size(self):
+        return len(self.images)
+
+    def num_classes(self):
+        return self.num_classes_
+
+    def has_label(self, label):
+        return label < self.num_classes_
+
+    def label_to_name(self, label):
+        return str(label)
+
+    def load_image(self, image_index):
+        return self.images[image_index]
+
+    def load_annotations(self, image_index):
+        return {'labels': self.labels[image_index], 'bboxes': self.bboxes[image_index]}
+
+
+def empty_annotations(num_images):
+    return [np.zeros((0, 4))] * num_images, [np.zeros((0,))] * num_images
+
+
+def test_load_images():
+    # images of different sizes, filled with a (non integer) value identifying them
+    images = [np.full((10 + 4 * i, 20, 3), i + 0.5, dtype=np.float64) for i in range(5)]
+    generator = SimpleGenerator(images, *empty_annotations(len(images)))
+
+    loaded = list(load_images(generator))
+    assert len(loaded) == len(images)
+
+    for i, (image, scale) in enumerate(loaded):
+        # images are returned in order and the original values are not truncated
+        assert image.dtype == np.float32
+        np.testing.assert_allclose(image, i + 0.5)
+
+        # the scale is the scale used to resize the image
+        assert scale.dtype == np.float64
+        assert scale == compute_resize_scale(images[i].shape, min_side=16, max_side=32)
+        assert image.shape[:2] == tuple(np.round(np.array(images[i].shape[:2]) * scale).astype(int))
+
+
+class SimpleModel(object):
+    """ Returns fixed detections for each image, the image index is read from the pixel values.
+    """
+    def __init__(self, detections):
+        self.detections = detections
+
+    def predict_on_batch(self, inputs):
+        boxes, scores, labels = self.detections[int(round(inputs[0, 0, 0, 0]))]
+        return (
+            np.array(boxes, dtype=np.float32).reshape((1, -1, 4)),
+            np.array(scores, dtype=np.float32).reshape((1, -1)),
+            np.array(labels, dtype=np.int32).reshape((1, -1)),
+        )
+
+
+def test_compute_ap():
+    # duplicate recall values, only the last point of each recall step counts
+    assert _compute_ap(np.array([0.5, 0.5, 0.5]), np.array([1.0, 0.5, 1.0 / 3])) == pytest.approx(0.5)
+
+    # the precision envelope raises precision to the maximum precision at higher recall
+    recall    = np.array([0.25, 0.5, 0.5, 1.0])
+    precision = np.array([1.0, 0.5, 0.67, 0.5])
+    assert _compute_ap(recall, precision) == pytest.approx(0.25 * 1.0 + 0.25 * 0.67 + 0.5 * 0.5)
+
+    # perfect detections
+    assert _compute_ap(np.array([0.5, 1.0]), np.array([1.0, 1.0])) == pytest.approx(1.0)
+
+
+def test_evaluate():
+    images = [np.full((16, 16, 3), i, dtype=np.uint8) for i in range(3)]
+    bboxes = [
+        np.array([[0, 0, 10, 10]], dtype=np.float64),    # detected twice
+        np.zeros((0, 4), dtype=np.float64),              # no annotations
+        np.array([[20, 20, 30, 30]], dtype=np.float64),  # never detected
+    ]
+    labels = [np.array([0]), np.zeros((0,)), np.array([0])]
+    generator = SimpleGenerator(images, bboxes, labels)
+
+    model = SimpleModel([
+        ([[0, 0, 10, 10], [0, 0, 10, 10]], [0.9, 0.8], [0, 0]),  # true positive and duplicate false positive
+        ([[0, 0, 10, 10]], [0.7], [0]),                          # false positive, no annotations
+        ([], [], []),                                            # no detections
+    ])
+
+    average_precisions, _ = evaluate(generator, model)
+
+    # sorted by score: TP, FP, FP with two annotations gives recall 0.5 at precision 1
+    average_precision, num_annotations = average_precisions[0]
+    assert num_annotations == 2
+    assert average_precision == pytest.approx(0.5)
+
+
+def test_evaluate_all_detected():
+    images = [np.full((16, 16, 3), i, dtype=np.uint8) for i in range(2)]
+    bboxes = [
+        np.array([[0, 0, 10, 10], [5, 5, 15, 15]], dtype=np.float64),
+        np.array([[1, 1, 9, 9]], dtype=np.float64),
+    ]
+    labels = [np.array([0, 0]), np.array([0])]
+    generator = SimpleGenerator(images, bboxes, labels)
+
+    model = SimpleModel([
+        ([[5, 5, 15, 15], [0, 0, 10, 10]], [0.9, 0.6], [0, 0]),
+        ([[1, 1, 9, 9], [1, 1, 9, 9]], [0.8, 0.5], [0, 0]),
+    ])
+
+    average_precisions, _ = evaluate(generator, model)
+
+    # sorted by score: TP, TP, TP, FP, so all annotations are found before the first false positive
+    average_precision, num_annotations = average_precisions[0]
+    assert num_annotations == 3
+    assert average_precision == pytest.approx(1.0)
@@ -0,0 +1,53 @@
+"""
+Copyright 2017-2018 Fizyr (https://fizyr.com)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from keras_retinanet.utils.trt import CalibrationBatches
+
+import numpy as np
+
+
+def test_calibration_cache_not_read(tmpdir):
+    # a cache left by a previous build belongs to another model, it should be overwritten instead of reused
+    cache_path = str(tmpdir.join('model.engine.calibration'))
+    with open(cache_path, 'wb') as f:
+        f.write(b'stale')
+
+    calibrator = CalibrationBatches([np.ones((2, 3, 3))], (1, 2, 3, 3), cache_path=cache_path)
+    assert calibrator.read_calibration_cache() is None
+
+    calibrator.write_calibration_cache(b'fresh')
+    with open(cache_path, 'rb') as f:
+        assert f.read() == b'fresh'
+
+
+def test_calibration_batches():
+    images = [
+        np.ones((2, 3, 3)),
+        np.full((3, 2, 3), 2.0),
+    ]
+    calibrator = CalibrationBatches(images, (1, 2, 3, 3))
+    assert calibrator.get_batch_size() == 1
+
+    batch = calibrator.next_batch()
+    np.testing.assert_array_equal(batch, np.ones((1, 2, 3, 3)))
+
+    # images in the other orientation are cropped and zero padded
+    expected = np.zeros((1, 2, 3, 3))
+    expected[0, :, :2, :] = 2.0
+    batch = calibrator.next_batch()
+    np.testing.assert_array_equal(batch, expected)
+
+    assert calibrator.next_batch() is None